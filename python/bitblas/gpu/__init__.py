@@ -18,6 +18,7 @@ from .matmul_mma_dequantize import (
     MatmulTensorizationMMAWithDequantizeInfo,  # noqa: F401
 )
 from .matmul_wmma import MatmulTensorizationLegacy  # noqa: F401
+from .permutate import Permutate  # noqa: F401
 
 from .reduction import Reduction  # noqa: F401
 from .transpose import Transpose  # noqa: F401
@@ -1,11 +1,11 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 """A rule for GEMV and DecodeGEMV."""
-from functools import reduce
-from typing import List, Dict
+from math import prod
+from typing import List, Dict, Optional
 from tvm.target import Target
 from tvm.tir.function import PrimFunc
-from tvm import DataType, tir
+from tvm import tir
 import logging
 from ..base import (
     normalize_prim_func,
@@ -17,6 +17,47 @@ from .matmul_analysis import auto_inline_producers, auto_inline_consumers
 
 logger = logging.getLogger(__name__)
 
+# bits of the supported decode target formats, avoid constructing DataType per schedule
+_DTYPE_BITS = {
+    "float16": 16,
+    "bfloat16": 16,
+    "int8": 8,
+    "e4m3_float8": 8,
+    "e5m2_float8": 8,
+}
+
+
+def check_dequantize_info(dequantize_info) -> bool:
+    # currently only support weight only dequantization
+    # TODO(@lei) check if the dequantize value name is weight
+    return len(dequantize_info) == 1
+
+
+def check_weight_decode_info(weight_decode_info) -> bool:
+    # check source format in ["int", "fp", "nf"]
+    # check source bits in [1, 2, 4, 8]
+    # check target format in ["float16", "int8"]
+    return ("source_format" in weight_decode_info and
+            weight_decode_info["source_format"]["format"]
+            in ["uint", "int", "fp", "nf", "fp_e5m2", "fp_e4m3"] and
+            weight_decode_info["source_format"]["bits"] in [1, 2, 4, 8] and
+            "target_format" in weight_decode_info and
+            weight_decode_info["target_format"] in ["float16", "int8"])
+
+
+def get_weight_decode_info(func: tir.PrimFunc) -> Optional[Dict]:
+    """Return the validated weight decode info of the function, None if it is not supported."""
+    dequantize_info = func.attrs["dequantize_info"]
+    if not check_dequantize_info(dequantize_info):
+        logger.debug("Dequantize info is not valid")
+        return None
+
+    (weight_decode_info,) = list(dequantize_info.values())
+    if not check_weight_decode_info(weight_decode_info):
+        logger.debug("Weight Dequantize info is not valid")
+        return None
+    return weight_decode_info
+
 
 class GEMVWithDequantizeInfo(GPUScheduleRule):
     """A rule for Dequantized GEMV."""
@@ -30,36 +71,8 @@ class GEMVWithDequantizeInfo(GPUScheduleRule):
         sch = tir.Schedule(func)
         from .intrin import get_lop3_intrin_group
 
-        dequantize_info = func.attrs["dequantize_info"]
-
-        def check_dequantize_info(dequantize_info):
-            conditions = []
-            # currently only support weight only dequantization
-            conditions.append(len(dequantize_info) == 1)
-            # TODO(@lei) check if the dequantize value name is weight
-            return all(conditions)
-
-        if not check_dequantize_info(dequantize_info):
-            logger.debug("Dequantize info is not valid")
-            return None
-
-        (weight_decode_info,) = list(dequantize_info.values())
-
-        def check_weight_decode_info(weight_decode_info):
-            conditions = []
-            # check source format in ["int", "fp", "nf"]
-            conditions.append("source_format" in weight_decode_info)
-            conditions.append(weight_decode_info["source_format"]["format"] in
-                              ["uint", "int", "fp", "nf", "fp_e5m2", "fp_e4m3"])
-            # check source bits in [1, 2, 4, 8]
-            conditions.append(weight_decode_info["source_format"]["bits"] in [1, 2, 4, 8])
-            # check target format in ["float16", "int8"]
-            conditions.append("target_format" in weight_decode_info)
-            conditions.append(weight_decode_info["target_format"] in ["float16", "int8"])
-            return all(conditions)
-
-        if not check_weight_decode_info(weight_decode_info):
-            logger.debug("Weight Dequantize info is not valid")
+        weight_decode_info = get_weight_decode_info(func)
+        if weight_decode_info is None:
             return None
 
         block_infos = normalize_prim_func(sch)
@@ -74,13 +87,13 @@ class GEMVWithDequantizeInfo(GPUScheduleRule):
             o_loops: List[tir.schedule.LoopRV] = []
             dom_kind = block.dom_kind()
             block = block.block_rv
+            loops = sch.get_loops(block)
 
-            if (any([
-                    sch.get(loop_rv).thread_binding is not None for loop_rv in sch.get_loops(block)
-            ]) or len(sch.get_loops(block)) == 0):
+            if (any([sch.get(loop_rv).thread_binding is not None for loop_rv in loops]) or
+                    len(loops) == 0):
                 continue
 
-            for loop, iter_type in zip(sch.get_loops(block), dom_kind):
+            for loop, iter_type in zip(loops, dom_kind):
                 {"S": s_loops, "R": r_loops, "O": o_loops}[iter_type].append(loop)
 
             if not s_loops:
@@ -88,12 +101,9 @@ class GEMVWithDequantizeInfo(GPUScheduleRule):
             if len(r_loops) > 0:
                 reduction_block = block
 
-        def prod(iterable):
-            return reduce(lambda x, y: x * y, iterable, 1)
-
         def get_vectorize_factor(target_format):
             # coalesced access requires the vectorize factor to be the same as the transaction size
-            return 128 // DataType(target_format).bits
+            return 128 // _DTYPE_BITS[target_format]
 
         vec = get_vectorize_factor(weight_decode_info["target_format"])
         num_warps = 1
@@ -106,13 +116,14 @@ class GEMVWithDequantizeInfo(GPUScheduleRule):
         block_decode_B = sch.cache_read(block_b, 1, "local")
         sch.compute_inline(B_decode_block)
 
-        j, k = sch.get_loops(block_b)[-2:]
-        if len(sch.get_loops(block_b)) == 3:
-            i = sch.get_loops(block_b)[0]
+        block_b_loops = sch.get_loops(block_b)
+        j, k = block_b_loops[-2:]
+        if len(block_b_loops) == 3:
+            i = block_b_loops[0]
             sch.bind(i, "blockIdx.z")
-        elif len(sch.get_loops(block_b)) == 4:
+        elif len(block_b_loops) == 4:
             # splitk case
-            sk, i = sch.get_loops(block_b)[:2]
+            sk, i = block_b_loops[:2]
             sch.bind(sk, "blockIdx.y")
             sch.bind(i, "blockIdx.z")
 
@@ -199,36 +210,8 @@ class GEMVWithDequantizeInfo(GPUScheduleRule):
         sch = tir.Schedule(func)
         from .intrin import get_lop3_intrin_group
 
-        dequantize_info = func.attrs["dequantize_info"]
-
-        def check_dequantize_info(dequantize_info):
-            conditions = []
-            # currently only support weight only dequantization
-            conditions.append(len(dequantize_info) == 1)
-            # TODO(@lei) check if the dequantize value name is weight
-            return all(conditions)
-
-        if not check_dequantize_info(dequantize_info):
-            logger.debug("Dequantize info is not valid")
-            return None
-
-        (weight_decode_info,) = list(dequantize_info.values())
-
-        def check_weight_decode_info(weight_decode_info):
-            conditions = []
-            # check source format in ["int", "fp", "nf"]
-            conditions.append("source_format" in weight_decode_info)
-            conditions.append(weight_decode_info["source_format"]["format"] in
-                              ["uint", "int", "fp", "nf", "fp_e5m2", "fp_e4m3"])
-            # check source bits in [1, 2, 4, 8]
-            conditions.append(weight_decode_info["source_format"]["bits"] in [1, 2, 4, 8])
-            # check target format in ["float16", "int8"]
-            conditions.append("target_format" in weight_decode_info)
-            conditions.append(weight_decode_info["target_format"] in ["float16", "int8"])
-            return all(conditions)
-
-        if not check_weight_decode_info(weight_decode_info):
-            logger.debug("Weight Dequantize info is not valid")
+        weight_decode_info = get_weight_decode_info(func)
+        if weight_decode_info is None:
             return None
 
         block_infos = normalize_prim_func(sch)
@@ -243,13 +226,13 @@ class GEMVWithDequantizeInfo(GPUScheduleRule):
             o_loops: List[tir.schedule.LoopRV] = []
             dom_kind = block.dom_kind()
             block = block.block_rv
+            loops = sch.get_loops(block)
 
-            if (any([
-                    sch.get(loop_rv).thread_binding is not None for loop_rv in sch.get_loops(block)
-            ]) or len(sch.get_loops(block)) == 0):
+            if (any([sch.get(loop_rv).thread_binding is not None for loop_rv in loops]) or
+                    len(loops) == 0):
                 continue
 
-            for loop, iter_type in zip(sch.get_loops(block), dom_kind):
+            for loop, iter_type in zip(loops, dom_kind):
                 {"S": s_loops, "R": r_loops, "O": o_loops}[iter_type].append(loop)
 
             if not s_loops:
@@ -257,12 +240,9 @@ class GEMVWithDequantizeInfo(GPUScheduleRule):
             if len(r_loops) > 0:
                 reduction_block = block
 
-        def prod(iterable):
-            return reduce(lambda x, y: x * y, iterable, 1)
-
         def get_vectorize_factor(target_format):
             # coalesced access requires the vectorize factor to be the same as the transaction size
-            return config.arch.transaction_size[-1] // DataType(target_format).bits
+            return config.arch.transaction_size[-1] // _DTYPE_BITS[target_format]
 
         vec = get_vectorize_factor(weight_decode_info["target_format"])
         num_warps = int(prod(config.thread))
@@ -275,13 +255,14 @@ class GEMVWithDequantizeInfo(GPUScheduleRule):
         block_decode_B = sch.cache_read(block_b, 1, "local")
         sch.compute_inline(B_decode_block)
 
-        j, k = sch.get_loops(block_b)[-2:]
-        if len(sch.get_loops(block_b)) == 3:
-            i = sch.get_loops(block_b)[0]
+        block_b_loops = sch.get_loops(block_b)
+        j, k = block_b_loops[-2:]
+        if len(block_b_loops) == 3:
+            i = block_b_loops[0]
             sch.bind(i, "blockIdx.z")
-        elif len(sch.get_loops(block_b)) == 4:
+        elif len(block_b_loops) == 4:
             # splitk case
-            sk, i = sch.get_loops(block_b)[:2]
+            sk, i = block_b_loops[:2]
             sch.bind(sk, "blockIdx.y")
             sch.bind(i, "blockIdx.z")
             assert len(config.thread) == 2, "SplitK only support 2D thread config"
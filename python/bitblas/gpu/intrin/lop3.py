@@ -603,6 +603,97 @@ __device__ void decode_i1u_to_f16_scale_zeros_rescale(T1 *_i4u, T2 *B_local_deco
 }
 """
 
+decode_i8_to_f16 = """
+template <typename T1, typename T2, bool isSigned = false>
+__device__ void decode_i8b_to_f16(T1 *_i8s, T2 *B_local_decode, const int N = 8)
+{
+    uint *h = reinterpret_cast<uint *>(B_local_decode);
+
+    // the weight is interleaved as {e0,e2,e1,e3} by lop3 permutate,
+    // which allows prmt to select {e0,e1} and {e2,e3} into the low bytes of two fp16x2.
+    static constexpr uint FP16_TOP_MAGIC_NUM = 0x64646464;
+    static constexpr uint MASK_FOR_ELT_01 = 0x5250;
+    static constexpr uint MASK_FOR_ELT_23 = 0x5351;
+    // Minus 1024 (+ 128 of the flipped sign bit) to get the original value
+    static constexpr uint MEDIAN_NUM = isSigned ? 0x64806480 : 0x64006400;
+    uint const *i8s = reinterpret_cast<uint *>(_i8s);
+#pragma unroll
+    // decode 4 elems at one time.
+    for (int i = 0; i < (N / 4); i++)
+    {
+        // flip the sign bits of two's complement weights, which gives the biased x + 128
+        uint const i8 = isSigned ? (i8s[i] ^ 0x80808080) : i8s[i];
+        asm volatile("prmt.b32 %0, %1, %2, %3;\\n"
+                     : "=r"(h[2 * i])
+                     : "r"(i8), "n"(FP16_TOP_MAGIC_NUM), "n"(MASK_FOR_ELT_01));
+        asm volatile("prmt.b32 %0, %1, %2, %3;\\n"
+                     : "=r"(h[2 * i + 1])
+                     : "r"(i8), "n"(FP16_TOP_MAGIC_NUM), "n"(MASK_FOR_ELT_23));
+        asm volatile("sub.f16x2 %0, %1, %2;\\n" : "=r"(h[2 * i]) : "r"(h[2 * i]), "r"(MEDIAN_NUM));
+        asm volatile("sub.f16x2 %0, %1, %2;\\n" : "=r"(h[2 * i + 1]) : "r"(h[2 * i + 1]), "r"(MEDIAN_NUM));
+    }
+}
+
+template <typename T1, typename T2>
+__device__ void decode_i8s_to_f16(T1 *_i8s, T2 *B_local_decode, const int N = 8)
+{
+    decode_i8b_to_f16<T1, T2, true>(_i8s, B_local_decode, N);
+}
+
+template <typename T1, typename T2>
+__device__ void decode_i8u_to_f16(T1 *_i8u, T2 *B_local_decode, const int N = 8)
+{
+    decode_i8b_to_f16<T1, T2, false>(_i8u, B_local_decode, N);
+}
+"""
+
+decode_i8_to_f16_scale = """
+template <typename T1, typename T2, typename T3, bool isSigned = false>
+__device__ void decode_i8b_to_f16_scale(T1 *_i8s, T2 *B_local_decode, const int N = 8, const T3 *scale = nullptr)
+{
+    uint *h = reinterpret_cast<uint *>(B_local_decode);
+
+    static constexpr uint FP16_TOP_MAGIC_NUM = 0x64646464;
+    static constexpr uint MASK_FOR_ELT_01 = 0x5250;
+    static constexpr uint MASK_FOR_ELT_23 = 0x5351;
+    // Minus 1024 (+ 128 of the flipped sign bit) to get the original value
+    static constexpr uint MEDIAN_NUM = isSigned ? 0x64806480 : 0x64006400;
+    uint const *i8s = reinterpret_cast<uint *>(_i8s);
+    T3 const scale_r = *scale;
+    uint const packed_scales = __pack_half2(scale_r, scale_r);
+
+#pragma unroll
+    // decode 4 elems at one time.
+    for (int i = 0; i < (N / 4); i++)
+    {
+        // flip the sign bits of two's complement weights, which gives the biased x + 128
+        uint const i8 = isSigned ? (i8s[i] ^ 0x80808080) : i8s[i];
+        asm volatile("prmt.b32 %0, %1, %2, %3;\\n"
+                     : "=r"(h[2 * i])
+                     : "r"(i8), "n"(FP16_TOP_MAGIC_NUM), "n"(MASK_FOR_ELT_01));
+        asm volatile("prmt.b32 %0, %1, %2, %3;\\n"
+                     : "=r"(h[2 * i + 1])
+                     : "r"(i8), "n"(FP16_TOP_MAGIC_NUM), "n"(MASK_FOR_ELT_23));
+        asm volatile("sub.f16x2 %0, %1, %2;\\n" : "=r"(h[2 * i]) : "r"(h[2 * i]), "r"(MEDIAN_NUM));
+        asm volatile("sub.f16x2 %0, %1, %2;\\n" : "=r"(h[2 * i + 1]) : "r"(h[2 * i + 1]), "r"(MEDIAN_NUM));
+        asm volatile("fma.rn.f16x2 %0, %1, %2, %3;\\n" : "=r"(h[2 * i]) : "r"(h[2 * i]), "r"(packed_scales), "r"(0));
+        asm volatile("fma.rn.f16x2 %0, %1, %2, %3;\\n" : "=r"(h[2 * i + 1]) : "r"(h[2 * i + 1]), "r"(packed_scales), "r"(0));
+    }
+}
+
+template <typename T1, typename T2, typename T3>
+__device__ void decode_i8s_to_f16_scale(T1 *_i8s, T2 *B_local_decode, T3 *scale = nullptr, const int N = 8)
+{
+    decode_i8b_to_f16_scale<T1, T2, T3, true>(_i8s, B_local_decode, N, scale);
+}
+
+template <typename T1, typename T2, typename T3>
+__device__ void decode_i8u_to_f16_scale(T1 *_i8u, T2 *B_local_decode, T3 *scale = nullptr, const int N = 8)
+{
+    decode_i8b_to_f16_scale<T1, T2, T3, false>(_i8u, B_local_decode, N, scale);
+}
+"""
+
 decode_i1s_to_i8s = """template <typename T1, typename T2>
 __device__ void decode_i1s_to_i8s(T1 *_i1b, T2 *_i8s, const int N = 16)
 {
@@ -804,6 +895,14 @@ def get_fast_decode_intrin(
     else:
         raise ValueError("Unsupported source_format: {}".format(source_format))
 
+    if source_bit == 8:
+        # 8 bit weights are not compressed, the dequantize tir is a plain cast of the
+        # storage, which holds two's complement int8 or the raw bytes of uint8.
+        def decode_func(nbit: int, val: tvm.tir.PrimExpr, pos: tvm.tir.PrimExpr, dtype: str):
+            if source_format == "uint":
+                val = val.astype("uint8")
+            return val.astype(dtype)
+
     if with_scale is False:
 
         @T.prim_func
@@ -1586,6 +1685,52 @@ TensorIntrin.register(
     ),
 )
 
+LOP3_FAST_DECODE_UINT8_TO_INT8_TO_FP16_L8_INTRIN = ("lop3_fast_decode_u8_to_int8_to_f16_l8_")
+TensorIntrin.register(
+    LOP3_FAST_DECODE_UINT8_TO_INT8_TO_FP16_L8_INTRIN,
+    *get_fast_decode_intrin(
+        source_bit=8, storage_dtype="int8", target_dtype="float16", loops_extent=8),
+)
+
+LOP3_FAST_DECODE_UINT8_TO_INT8_TO_FP16_L8_SCALE_INTRIN = (
+    "lop3_fast_decode_u8_to_int8_to_f16_l8_scale_")
+TensorIntrin.register(
+    LOP3_FAST_DECODE_UINT8_TO_INT8_TO_FP16_L8_SCALE_INTRIN,
+    *get_fast_decode_intrin(
+        source_bit=8,
+        storage_dtype="int8",
+        target_dtype="float16",
+        loops_extent=8,
+        with_scale=True,
+    ),
+)
+
+LOP3_FAST_DECODE_INT8_TO_INT8_TO_FP16_L8_INTRIN = ("lop3_fast_decode_i8_to_int8_to_f16_l8_")
+TensorIntrin.register(
+    LOP3_FAST_DECODE_INT8_TO_INT8_TO_FP16_L8_INTRIN,
+    *get_fast_decode_intrin(
+        source_bit=8,
+        storage_dtype="int8",
+        source_format="int",
+        target_dtype="float16",
+        loops_extent=8,
+    ),
+)
+
+LOP3_FAST_DECODE_INT8_TO_INT8_TO_FP16_L8_SCALE_INTRIN = (
+    "lop3_fast_decode_i8_to_int8_to_f16_l8_scale_")
+TensorIntrin.register(
+    LOP3_FAST_DECODE_INT8_TO_INT8_TO_FP16_L8_SCALE_INTRIN,
+    *get_fast_decode_intrin(
+        source_bit=8,
+        storage_dtype="int8",
+        source_format="int",
+        target_dtype="float16",
+        loops_extent=8,
+        with_scale=True,
+    ),
+)
+
 
 def get_lop3_intrin_group(
     out_dtype: Literal["float16", "int8"],
@@ -1637,6 +1782,8 @@ def get_lop3_intrin_group(
         _intrin += f"zeros_{zeros_mode}_"
 
     import_c_map = {
+        "i8_to_f16": decode_i8_to_f16,
+        "i8_to_f16_scale": decode_i8_to_f16_scale,
         "i4_to_f16": decode_i4_to_f16,
         "i2_to_f16": decode_i2_to_f16,
         "i1_to_f16": decode_i1_to_f16,
@@ -62,11 +62,14 @@ def auto_inline_producers(
     skip_blocks: Optional[List[tir.schedule.BlockRV]] = None,
 ):
     skip_blocks = skip_blocks or []
+    # block names are unique and stable under inlining, compare them instead of
+    # re-fetching every skip block from the schedule for each producer.
+    skip_block_names = {sch.get(skip_block).name_hint for skip_block in skip_blocks}
     while True:
         inlined_cnt = 0
         producers = _collect_producers(sch, block)
         for producer in producers:
-            if any(sch.get(producer) == sch.get(skip_block) for skip_block in skip_blocks):
+            if skip_block_names and sch.get(producer).name_hint in skip_block_names:
                 continue
             try:
                 sch.compute_inline(producer)
@@ -0,0 +1,93 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""A rule for the tiled layout permutation of ladder permutate."""
+from typing import List, Union
+
+from tvm import DataType, tir
+from tvm.target import Target
+from tvm.tir import Schedule
+from tvm.tir.schedule import BlockRV
+
+from ..base import normalize_prim_func
+from .base import GPUScheduleRule
+
+
+class Permutate(GPUScheduleRule):
+    """
+    Schedule rule for the permutation from a (M, N) matrix into the (M // l, N // r, l, r)
+    tiled layout. Each block stages a row of consecutive (l, r) tiles through shared memory
+    so that both the global load and the global store are coalesced and 128-bit vectorized.
+    """
+
+    # the number of threads to fill with the tiles of one block
+    preferred_block_size = 128
+
+    def is_permutate(self, sch: Schedule, block_rv: BlockRV):
+        block = sch.get(block_rv)
+        if not isinstance(block.body, tir.BufferStore):
+            return False
+        rhs = block.body.value
+        if not isinstance(rhs, tir.BufferLoad):
+            return False
+        out_shape, in_shape = block.body.buffer.shape, rhs.buffer.shape
+        if len(out_shape) != 4 or len(in_shape) != 2:
+            return False
+        if not all(isinstance(e, tir.IntImm) for e in list(out_shape) + list(in_shape)):
+            return False
+        return (int(out_shape[0]) * int(out_shape[2]) == int(in_shape[0]) and
+                int(out_shape[1]) * int(out_shape[3]) == int(in_shape[1]))
+
+    def apply(  # pylint: disable=too-many-locals
+        self,
+        func: tir.PrimFunc,
+        target: Target,
+        _: bool,
+    ) -> Union[None, tir.Schedule, List[tir.Schedule]]:
+        if not isinstance(func, tir.PrimFunc) or not self.is_target_available(target):
+            return None
+
+        sch = tir.Schedule(func)
+        blocks = normalize_prim_func(sch)
+        if blocks is None or len(blocks) != 1:
+            return None
+        block = blocks[0].block_rv
+        if not self.is_permutate(sch, block):
+            return None
+        loops = sch.get_loops(block)
+        if len(loops) != 4:
+            return None
+
+        out_buffer = sch.get(block).body.buffer
+        l, r = (int(e) for e in out_buffer.shape[-2:])  # noqa: E741
+        # 128-bit transactions for both the global load and store
+        vec = min(128 // DataType(out_buffer.dtype).bits, r)
+        num_threads = l * r // vec
+        # a single tile only takes 16-32 threads, put consecutive tiles along j into
+        # one block (one tile per threadIdx.y) to keep the occupancy up.
+        num_tiles = max(1, self.preferred_block_size // num_threads)
+        while int(out_buffer.shape[1]) % num_tiles:
+            num_tiles //= 2
+
+        i, j, ii, jj = loops
+        j, ty = sch.split(j, factors=[None, num_tiles])
+        bx = sch.fuse(i, j)
+        sch.bind(bx, "blockIdx.x")
+        sch.bind(ty, "threadIdx.y")
+
+        cache_read = sch.cache_read(block, read_buffer_index=0, storage_scope="shared")
+        sch.compute_at(cache_read, bx, preserve_unit_loops=True)
+        fused = sch.fuse(*sch.get_loops(cache_read)[1:])
+        _, cache_ty, tx, v = sch.split(fused, factors=[None, num_tiles, num_threads, vec])
+        sch.bind(cache_ty, "threadIdx.y")
+        sch.bind(tx, "threadIdx.x")
+        sch.vectorize(v)
+        if vec < r:
+            # pad each row by one vector to avoid bank conflicts on the permuted
+            # shared memory reads while keeping the rows 128-bit aligned
+            sch.storage_align(
+                block=cache_read, buffer_index=0, axis=0, factor=num_tiles * r, offset=vec)
+
+        _, tx, v = sch.split(sch.fuse(ii, jj), factors=[None, num_threads, vec])
+        sch.bind(tx, "threadIdx.x")
+        sch.vectorize(v)
+        return sch
@@ -102,12 +102,32 @@ class MatmulConfig:
         else:
             object.__setattr__(self, "propagate_b", TransformKind.IntraWarpTransform)
 
+        # only the nt layout implements the propagation of the input, and the nn layout
+        # only implements the propagation of a float16 weight without dequantize.
+        is_propagate_b_supported = (
+            self.layout == "nt" or
+            (self.layout == "nn" and self.A_dtype == self.W_dtype == "float16"))
+        if self.layout != "nt":
+            object.__setattr__(self, "propagate_a", TransformKind.NonTransform)
+        if not is_propagate_b_supported:
+            object.__setattr__(self, "propagate_b", TransformKind.NonTransform)
+
         # set a and b value if is not None
         if propagate_a is not None:
             object.__setattr__(self, "propagate_a", propagate_a)
         if propagate_b is not None:
             object.__setattr__(self, "propagate_b", propagate_b)
 
+        if self.propagate_a and self.layout != "nt":
+            raise ValueError(
+                f"propagate_a is not supported for layout={self.layout}, "
+                "only the input of the nt layout can be propagated.")
+        if self.propagate_b and not is_propagate_b_supported:
+            raise ValueError(
+                f"propagate_b is not supported for layout={self.layout} with "
+                f"A_dtype={self.A_dtype} and W_dtype={self.W_dtype}, "
+                "only float16 weights can be propagated with the nn layout.")
+
         # TODO(lei): This is a limitation arose by pytorch and llvm
         # Should be removed in the future.
         if self.A_dtype in ["e4m3_float8", "e5m2_float8"]:
@@ -124,7 +144,8 @@ class MatmulConfig:
             conditions = []
             conditions.append("int" not in self.W_dtype)
             conditions.append(self.W_dtype == self.A_dtype)
-            # int8,uint8 also do not implement and also do not require fast decoding
+            # int8,uint8 implement fast decoding but keep it off unless requested, the weights
+            # are not compressed and their decoding is a plain conversion already.
             conditions.append(self.W_dtype in ["int8", "uint8"])
             return any(conditions)
 
@@ -183,6 +204,8 @@ class MatmulConfig:
 
 class Matmul(Operator):
 
+    CACHEABLE_POSTPROC = True
+
     # TODO(lei): This should be improved into a general datatype.
     BITBLAS_TRICK_DTYPE_MAP = {
         "float64": ("fp", 64),
@@ -270,9 +293,10 @@ class Matmul(Operator):
             self.ladder_permutate_a = None
 
         if self.propagate_b:
+            # the weight is stored as (N, K) for nt and as (K, N) for nn
             ladder_permutate_config = LadderPermutateConfig(
-                M=self.N,
-                N=self.K,
+                M=self.N if self.layout == "nt" else self.K,
+                N=self.K if self.layout == "nt" else self.N,
                 datatype=self.A_dtype,
                 dequantize_bits=self.bit,
                 storage_dtype=self.storage_dtype,
@@ -395,7 +419,8 @@ class Matmul(Operator):
                 propagate_b=self.propagate_b,
             )
 
-    def post_process(self, code: str) -> str:
+    @staticmethod
+    def post_process(code: str) -> str:
         code = tensor_replace_dp4a(code)
         code = tensor_remove_make_int4(code)
         code = tensor_remove_make_int2(code)
@@ -504,6 +529,7 @@ class Matmul(Operator):
 
         if self.lib is None:
             self._forward_from_torch_func(*args)
+            return output
         self._forward_from_prebuild_lib(*args, stream=stream.cuda_stream)
 
         return output
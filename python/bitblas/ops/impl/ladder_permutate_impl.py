@@ -1,32 +1,39 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
+from functools import lru_cache
 from bitblas.gpu.matmul_analysis import get_propagate_map
 from typing import Literal
 from tvm import te, IRModule, DataType
 from tvm.tir import IndexMap
 
 
-def select_implementation(
-    M: int,
-    N: int,
-    datatype: Literal["float16", "int8", "e4m3_float8", "e5m2_float8"] = "float16",
-    dequantize_bits: int = -1,
-    storage_dtype: Literal["float16", "int8", "uint8", "int32", "uint32"] = "float16",
-    propagate_kind: Literal["A", "B"] = "B",
-    transpose_matrix: bool = False,
-    transform_kind: int = 0,
-    target_instruction: Literal["nvidia-mma"] = "nvidia-mma",
+@lru_cache(maxsize=None)
+def _cached_intra_map(
+    datatype: str,
+    propagate_kind: str,
+    transpose_matrix: bool,
 ):
-    if target_instruction != "nvidia-mma":
-        raise ValueError("Currently only support nvidia-mma instruction")
+    # IndexMaps are immutable, so the same objects can be shared among
+    # all the permutate ops that are built with the same layout.
+    intra_index_map, _ = get_propagate_map(
+        transpose_matrix, dtype=datatype, matrix_name=propagate_kind)
+    return intra_index_map
+
 
+@lru_cache(maxsize=None)
+def _cached_scaled_maps(
+    datatype: str,
+    propagate_kind: str,
+    transpose_matrix: bool,
+    dequantize_bits: int,
+    storage_dtype: str,
+):
     # This is trick to get the basic tile size for the current datatype
     # as for nvidia tensorcore instruction, the basic tile size is 16x16/16x32 for float16/int8
     l = r = 16  # noqa: E741
     if datatype in ["int8", "e4m3_float8", "e5m2_float8"]:
         l, r = 16, 32  # noqa: E741
-    intra_index_map, _ = get_propagate_map(
-        transpose_matrix, dtype=datatype, matrix_name=propagate_kind)
+    intra_index_map = _cached_intra_map(datatype, propagate_kind, transpose_matrix)
 
     target_dtype = DataType(datatype)
     scaling_factor = 1
@@ -45,35 +52,44 @@ def select_implementation(
             scaling_final_indices,
             None,
         )
+    return intra_index_map, scaling_factor, l, r
+
+
+def select_implementation(
+    M: int,
+    N: int,
+    datatype: Literal["float16", "int8", "e4m3_float8", "e5m2_float8"] = "float16",
+    dequantize_bits: int = -1,
+    storage_dtype: Literal["float16", "int8", "uint8", "int32", "uint32"] = "float16",
+    propagate_kind: Literal["A", "B"] = "B",
+    transpose_matrix: bool = False,
+    transform_kind: int = 0,
+    target_instruction: Literal["nvidia-mma"] = "nvidia-mma",
+):
+    if target_instruction != "nvidia-mma":
+        raise ValueError("Currently only support nvidia-mma instruction")
+
+    intra_index_map, scaling_factor, l, r = _cached_scaled_maps(  # noqa: E741
+        datatype, propagate_kind, transpose_matrix, dequantize_bits, storage_dtype)
 
     inp = te.placeholder((M, N // scaling_factor), name="inp", dtype=storage_dtype)
     args = [inp]
 
     if transform_kind >= 1:
-        arg = args[-1]
-
-        inter_warp = te.compute(
-            (M // l, (N // scaling_factor) // r, l, r),
-            lambda i, j, ii, jj: arg[i * l + ii, j * r + jj],
-            name="inter_warp_permutate",
-        )
-        args.append(inter_warp)
-    if transform_kind >= 2:
-        arg = args[-1]
-
-        def fcompute(*args):
-            warp_i, warp_j = args[-2:]
-            spatial_args = args[:-2]
-            permutate_i, permutate_j = intra_index_map.map_indices([warp_i, warp_j])
-            new_index = (*spatial_args, permutate_i, permutate_j)
-            return arg[new_index]
+        # the inter-warp and intra-warp permutations are pure index remaps,
+        # compose them into a single stage to avoid materializing the
+        # inter-warp layout in between.
+        def fcompute(i, j, ii, jj):
+            if transform_kind >= 2:
+                ii, jj = intra_index_map.map_indices([ii, jj])
+            return inp[i * l + ii, j * r + jj]
 
-        intra_warp = te.compute(
+        permutate = te.compute(
             (M // l, (N // scaling_factor) // r, l, r),
             fcompute,
-            name="intra_warp_permutate",
+            name="intra_warp_permutate" if transform_kind >= 2 else "inter_warp_permutate",
         )
-        args.append(intra_warp)
+        args.append(permutate)
     args = [args[0], args[-1]]
 
     func = te.create_prim_func(args)
@@ -19,6 +19,10 @@ def tir_interleave_weight(
 ):
     if QK == -1:
         QK = K * bits // 32
+    # interleave the elements so that the fast decoding can extract a pair of
+    # target values with a single lop3, e.g. for int4 to float16 each word
+    # {e7,e6,e5,e4,e3,e2,e1,e0} is stored as {e7,e5,e3,e1,e6,e4,e2,e0}, then
+    # (i4s >> (4 * i)) & 0x000f000f gives {e(2i+1), e(2i)} in decode_i4b_to_f16.
     bits_stride = DataType(target_dtype).bits
     mask = (1 << bits) - 1  # for 4bit the val is 0x0000000f
     num_groups = 32 // bits_stride
@@ -81,7 +81,7 @@ def matmul_nt_dequantize_b(
         elif source_format == "uint":
             if bit == 8:
                 # 8 bit does not need to be compressed
-                w = B[n, k].astype(in_dtype)
+                w = B[n, k].astype("uint8").astype(in_dtype)
             else:
                 w = _tir_packed_to_unsigned_convert(storage_type, storage_nbit)(
                     bit, B[n, k // n_float_per_elem], k % n_float_per_elem, dtype=in_dtype)
@@ -252,7 +252,7 @@ def matmul_nt_dequantize_b_propagate_b(
         if source_format == "uint":
             if bit == 8:
                 # 8 bit does not need to be compressed
-                w = B_reindex[n, k].astype(in_dtype)
+                w = B_reindex[n, k].astype("uint8").astype(in_dtype)
             else:
                 w = _tir_packed_to_unsigned_convert(storage_type, storage_nbit)(
                     bit,
@@ -448,7 +448,7 @@ def matmul_nt_dequantize_b_propagate_a_propagate_b(
         if source_format == "uint":
             if bit == 8:
                 # 8 bit does not need to be compressed
-                w = B_reindex[n, k].astype(in_dtype)
+                w = B_reindex[n, k].astype("uint8").astype(in_dtype)
             else:
                 w = _tir_packed_to_unsigned_convert(storage_type, storage_nbit)(
                     bit,
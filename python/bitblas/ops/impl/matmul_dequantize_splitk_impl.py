@@ -45,7 +45,7 @@ def matmul_nt_dequantize_b(
         if source_format == "uint":
             if bit == 8:
                 # 8 bit does not need to be compressed
-                w = B[n, k].astype(in_dtype)
+                w = B[n, k].astype("uint8").astype(in_dtype)
             else:
                 w = _tir_packed_to_unsigned_convert(storage_type, storage_nbit)(
                     bit, B[n, k // n_float_per_elem], k % n_float_per_elem, dtype=in_dtype)
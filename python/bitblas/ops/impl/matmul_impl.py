@@ -1,11 +1,92 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 # pre-transformed tir expression of matmul
+from functools import lru_cache
 import tvm
 from tvm import te
 from bitblas.gpu.matmul_analysis import get_propagate_map
 from bitblas.ops.operator import TransformKind
 
+# The symbolic m of the dynamic shape functions, shared by all the builds so that the
+# functions of the same configuration are structurally equal across the builds.
+_DYN_M = tvm.te.var("m")
+
+# The function attributes that tell the schedule rules the layout of A and B.
+_INPUT_TRANSFORM_KIND = "input_transform_kind"
+_WEIGHT_TRANSFORM_KIND = "weight_transform_kind"
+
+# The basic (l, r) tile of the tensorcore instructions for every dtype that has a
+# propagate layout: 16x16 for float16 and 16x32 for the 8-bit dtypes. The other
+# dtypes default to 16x16 and are rejected by get_propagate_map.
+_MMA_TILE = {
+    "float16": (16, 16),
+    "int8": (16, 32),
+    "e4m3_float8": (16, 32),
+    "e5m2_float8": (16, 32),
+}
+
+
+@lru_cache(maxsize=None)
+def _propagate_map_cached(trans: bool, dtype: str, matrix_name: str):
+    # IndexMaps are immutable, share the (forward, inverse) pair among the builders
+    # instead of solving the inverse map again for every matmul of the same dtype.
+    return get_propagate_map(trans=trans, dtype=dtype, matrix_name=matrix_name)
+
+
+@lru_cache(maxsize=None)
+def _static_placeholder(shape, dtype: str, name: str):
+    return te.placeholder(shape, name=name, dtype=dtype)
+
+
+def _placeholder(shape, dtype: str, name: str):
+    # te tensors are immutable, the placeholders of static shapes are shared among
+    # the builds, while the ones with a symbolic m are created for every call.
+    if all(isinstance(dim, int) for dim in shape):
+        return _static_placeholder(tuple(shape), dtype, name)
+    return te.placeholder(shape, name=name, dtype=dtype)
+
+
+@lru_cache(maxsize=None)
+def _reduce_axis(K):
+    return te.reduce_axis((0, K), name="k")
+
+
+def _reindexer(T, inversed_index_map, transform_kind, l, r):  # noqa: E741
+    """Return the fcompute that reads the (l, r) tiled T in its original 2D layout."""
+
+    def fcompute(i, j):
+        warp_i, warp_j = i % l, j % r
+        if transform_kind >= TransformKind.IntraWarpTransform:
+            warp_i, warp_j = inversed_index_map.map_indices([warp_i, warp_j])
+        return T[i // l, j // r, warp_i, warp_j]
+
+    return fcompute
+
+
+def _finalize(C, Bias, inputs, with_bias, accum_dtype, out_dtype, M, N, attrs=()):
+    """Append the epilogue of the matmul C and build the IRModule of the function.
+
+    The attrs are (key, value) pairs attached to the function, e.g. the transform kinds.
+    """
+    last_output = C
+    if accum_dtype != out_dtype or with_bias:
+        # fuse the cast and the bias add into a single elementwise stage
+        def fepilogue(i, j):
+            value = C[i, j].astype(out_dtype)
+            if with_bias:
+                value = value + Bias[j].astype(out_dtype)
+            return value
+
+        last_output = te.compute((M, N), fepilogue, name="E" if with_bias else "D")
+
+    args = [*inputs, *([Bias] if with_bias else []), last_output]
+
+    func = te.create_prim_func(args)
+    for key, value in attrs:
+        func = func.with_attr(key, value)
+
+    return tvm.IRModule.from_expr(func)
+
 
 def matmul_nn(
     M,
@@ -17,32 +98,19 @@ def matmul_nn(
     with_bias=False,
 ):
     if not isinstance(M, int):
-        M = tvm.te.var("m")
-    A = te.placeholder((M, K), name="A", dtype=in_dtype)
-    B = te.placeholder((K, N), name="B", dtype=in_dtype)
-    Bias = te.placeholder((N,), name="Bias", dtype=in_dtype)
+        M = _DYN_M
+    A = _placeholder((M, K), in_dtype, "A")
+    B = _placeholder((K, N), in_dtype, "B")
+    Bias = _placeholder((N,), in_dtype, "Bias")
 
     # Describe the matrix multiplication in TE
-    k = te.reduce_axis((0, K), name="k")
+    k = _reduce_axis(K)
     C = te.compute(
         (M, N),
         lambda i, j: te.sum(A[i, k].astype(accum_dtype) * B[k, j].astype(accum_dtype), axis=k),
         name="C",
     )
-    last_output = C
-    if accum_dtype != out_dtype:
-        D = te.compute((M, N), lambda i, j: C[i, j].astype(out_dtype), name="D")
-        last_output = D
-
-    if with_bias:
-        E = te.compute((M, N), lambda i, j: last_output[i, j] + Bias[j], name="E")
-        last_output = E
-
-    args = [A, B, Bias, last_output] if with_bias else [A, B, last_output]
-
-    func = te.create_prim_func(args)
-
-    return tvm.IRModule.from_expr(func)
+    return _finalize(C, Bias, [A, B], with_bias, accum_dtype, out_dtype, M, N)
 
 
 def matmul_nt(
@@ -55,32 +123,44 @@ def matmul_nt(
     with_bias=False,
 ):
     if not isinstance(M, int):
-        M = tvm.te.var("m")
-    A = te.placeholder((M, K), name="A", dtype=in_dtype)
-    B = te.placeholder((N, K), name="B", dtype=in_dtype)
-    Bias = te.placeholder((N,), name="Bias", dtype=in_dtype)
+        M = _DYN_M
+    A = _placeholder((M, K), in_dtype, "A")
+    B = _placeholder((N, K), in_dtype, "B")
+    Bias = _placeholder((N,), in_dtype, "Bias")
 
     # Describe the matrix multiplication in TE
-    k = te.reduce_axis((0, K), name="k")
+    k = _reduce_axis(K)
     C = te.compute(
         (M, N),
         lambda i, j: te.sum(A[i, k].astype(accum_dtype) * B[j, k].astype(accum_dtype), axis=k),
         name="C",
     )
-    last_output = C
-    if accum_dtype != out_dtype:
-        D = te.compute((M, N), lambda i, j: C[i, j].astype(out_dtype), name="D")
-        last_output = D
-
-    if with_bias:
-        E = te.compute((M, N), lambda i, j: last_output[i, j] + Bias[j], name="E")
-        last_output = E
+    return _finalize(C, Bias, [A, B], with_bias, accum_dtype, out_dtype, M, N)
 
-    args = [A, B, Bias, last_output] if with_bias else [A, B, last_output]
 
-    func = te.create_prim_func(args)
+def matmul_tn(
+    M,
+    N,
+    K,
+    in_dtype="float16",
+    out_dtype="float16",
+    accum_dtype="float16",
+    with_bias=False,
+):
+    if not isinstance(M, int):
+        M = _DYN_M
+    A = _placeholder((K, M), in_dtype, "A")
+    B = _placeholder((N, K), in_dtype, "B")
+    Bias = _placeholder((N,), in_dtype, "Bias")
 
-    return tvm.IRModule.from_expr(func)
+    # Describe the matrix multiplication in TE
+    k = _reduce_axis(K)
+    C = te.compute(
+        (M, N),
+        lambda i, j: te.sum(A[k, i].astype(accum_dtype) * B[j, k].astype(accum_dtype), axis=k),
+        name="C",
+    )
+    return _finalize(C, Bias, [A, B], with_bias, accum_dtype, out_dtype, M, N)
 
 
 def matmul(
@@ -95,6 +175,8 @@ def matmul(
 ):
     if layout == "nn":
         return matmul_nn(M, N, K, in_dtype, out_dtype, accum_dtype, with_bias)
+    if layout == "tn":
+        return matmul_tn(M, N, K, in_dtype, out_dtype, accum_dtype, with_bias)
     return matmul_nt(M, N, K, in_dtype, out_dtype, accum_dtype, with_bias)
 
 
@@ -109,53 +191,43 @@ def matmul_nt_propagate_a(
     transform_kind: TransformKind = TransformKind.IntraWarpTransform,
 ):
     if not isinstance(M, int):
-        M = tvm.te.var("m")
-    l = r = 16  # noqa: E741
-    if in_dtype in ["int8", "e4m3_float8", "e5m2_float8"]:
-        l, r = 16, 32  # noqa: E741
+        M = _DYN_M
+    l, r = _MMA_TILE.get(in_dtype, (16, 16))  # noqa: E741
 
-    _, inversed_index_map = get_propagate_map(trans=False, dtype=in_dtype, matrix_name="A")
+    _, inversed_index_map = _propagate_map_cached(False, in_dtype, "A")
 
-    A = te.placeholder((M // l, K // r, l, r), name="A", dtype=in_dtype)
-    B = te.placeholder((N, K), name="B", dtype=in_dtype)
-    Bias = te.placeholder((N,), name="Bias", dtype=in_dtype)
-
-    def fcompute(i, j):
-        warp_i, warp_j = i % l, j % r
-        spatial_args = i // l, j // r
-        if transform_kind >= TransformKind.IntraWarpTransform:
-            warp_i, warp_j = inversed_index_map.map_indices([warp_i, warp_j])
-        new_index = (*spatial_args, warp_i, warp_j)
-        return A[new_index]
+    A = _placeholder((M // l, K // r, l, r), in_dtype, "A")
+    B = _placeholder((N, K), in_dtype, "B")
+    Bias = _placeholder((N,), in_dtype, "Bias")
 
+    # Keep the remap as a separate producer stage rather than inlining it into the
+    # reduction: the tensorcore schedule rewrites the layout of its read and then
+    # inlines it into the shared memory fetch, so it is never materialized, while
+    # a permuted access in the main block would hide the gemm pattern.
     A_reindex = te.compute(
         (M, K),
-        fcompute,
+        _reindexer(A, inversed_index_map, transform_kind, l, r),
         name="A_reindex",
     )
     # Describe the matrix multiplication in TE
-    k = te.reduce_axis((0, K), name="k")
+    k = _reduce_axis(K)
     C = te.compute(
         (M, N),
         lambda i, j: te.sum(
             A_reindex[i, k].astype(accum_dtype) * B[j, k].astype(accum_dtype), axis=k),
         name="C",
     )
-    last_output = C
-    if accum_dtype != out_dtype:
-        D = te.compute((M, N), lambda i, j: C[i, j].astype(out_dtype), name="D")
-        last_output = D
-
-    if with_bias:
-        E = te.compute((M, N), lambda i, j: last_output[i, j] + Bias[j], name="E")
-        last_output = E
-
-    args = [A, B, Bias, last_output] if with_bias else [A, B, last_output]
-
-    func = te.create_prim_func(args)
-    func = func.with_attr("input_transform_kind", transform_kind.value)
-
-    return tvm.IRModule.from_expr(func)
+    return _finalize(
+        C,
+        Bias,
+        [A, B],
+        with_bias,
+        accum_dtype,
+        out_dtype,
+        M,
+        N,
+        attrs=((_INPUT_TRANSFORM_KIND, transform_kind.value),),
+    )
 
 
 def matmul_nt_propagate_b(
@@ -169,53 +241,86 @@ def matmul_nt_propagate_b(
     transform_kind: TransformKind = TransformKind.IntraWarpTransform,
 ):
     if not isinstance(M, int):
-        M = tvm.te.var("m")
-    l = r = 16  # noqa: E741
-    if in_dtype in ["int8", "e4m3_float8", "e5m2_float8"]:
-        l, r = 16, 32  # noqa: E741
+        M = _DYN_M
+    l, r = _MMA_TILE.get(in_dtype, (16, 16))  # noqa: E741
 
-    _, inversed_index_map = get_propagate_map(trans=True, dtype=in_dtype, matrix_name="B")
+    _, inversed_index_map = _propagate_map_cached(True, in_dtype, "B")
 
-    A = te.placeholder((M, K), name="A", dtype=in_dtype)
-    B = te.placeholder((N // l, K // r, l, r), name="B", dtype=in_dtype)
-    Bias = te.placeholder((N,), name="Bias", dtype=in_dtype)
-
-    def fcompute(i, j):
-        warp_i, warp_j = i % l, j % r
-        spatial_args = i // l, j // r
-        if transform_kind >= TransformKind.IntraWarpTransform:
-            warp_i, warp_j = inversed_index_map.map_indices([warp_i, warp_j])
-        new_index = (*spatial_args, warp_i, warp_j)
-        return B[new_index]
+    A = _placeholder((M, K), in_dtype, "A")
+    B = _placeholder((N // l, K // r, l, r), in_dtype, "B")
+    Bias = _placeholder((N,), in_dtype, "Bias")
 
     B_reindex = te.compute(
         (N, K),
-        fcompute,
+        _reindexer(B, inversed_index_map, transform_kind, l, r),
         name="B_reindex",
     )
     # Describe the matrix multiplication in TE
-    k = te.reduce_axis((0, K), name="k")
+    k = _reduce_axis(K)
     C = te.compute(
         (M, N),
         lambda i, j: te.sum(
             A[i, k].astype(accum_dtype) * B_reindex[j, k].astype(accum_dtype), axis=k),
         name="C",
     )
-    last_output = C
-    if accum_dtype != out_dtype:
-        D = te.compute((M, N), lambda i, j: C[i, j].astype(out_dtype), name="D")
-        last_output = D
+    return _finalize(
+        C,
+        Bias,
+        [A, B],
+        with_bias,
+        accum_dtype,
+        out_dtype,
+        M,
+        N,
+        attrs=((_WEIGHT_TRANSFORM_KIND, transform_kind.value),),
+    )
 
-    if with_bias:
-        E = te.compute((M, N), lambda i, j: last_output[i, j] + Bias[j], name="E")
-        last_output = E
 
-    args = [A, B, Bias, last_output] if with_bias else [A, B, last_output]
+def matmul_nn_propagate_b(
+    M,
+    N,
+    K,
+    in_dtype="float16",
+    out_dtype="float16",
+    accum_dtype="float16",
+    with_bias=False,
+    transform_kind: TransformKind = TransformKind.IntraWarpTransform,
+):
+    if not isinstance(M, int):
+        M = _DYN_M
+    l, r = _MMA_TILE.get(in_dtype, (16, 16))  # noqa: E741
 
-    func = te.create_prim_func(args)
-    func = func.with_attr("weight_transform_kind", transform_kind.value)
+    # only the non-transposed ldmatrix layout of float16 is available for a (K, N) B
+    _, inversed_index_map = _propagate_map_cached(False, in_dtype, "B")
 
-    return tvm.IRModule.from_expr(func)
+    A = _placeholder((M, K), in_dtype, "A")
+    B = _placeholder((K // l, N // r, l, r), in_dtype, "B")
+    Bias = _placeholder((N,), in_dtype, "Bias")
+
+    B_reindex = te.compute(
+        (K, N),
+        _reindexer(B, inversed_index_map, transform_kind, l, r),
+        name="B_reindex",
+    )
+    # Describe the matrix multiplication in TE
+    k = _reduce_axis(K)
+    C = te.compute(
+        (M, N),
+        lambda i, j: te.sum(
+            A[i, k].astype(accum_dtype) * B_reindex[k, j].astype(accum_dtype), axis=k),
+        name="C",
+    )
+    return _finalize(
+        C,
+        Bias,
+        [A, B],
+        with_bias,
+        accum_dtype,
+        out_dtype,
+        M,
+        N,
+        attrs=((_WEIGHT_TRANSFORM_KIND, transform_kind.value),),
+    )
 
 
 def matmul_nt_propagate_a_propagate_b(
@@ -230,48 +335,29 @@ def matmul_nt_propagate_a_propagate_b(
     transform_kind_weight: TransformKind = TransformKind.IntraWarpTransform,
 ):
     if not isinstance(M, int):
-        M = tvm.te.var("m")
-    l = r = 16  # noqa: E741
-    if in_dtype in ["int8", "e4m3_float8", "e5m2_float8"]:
-        l, r = 16, 32  # noqa: E741
+        M = _DYN_M
+    l, r = _MMA_TILE.get(in_dtype, (16, 16))  # noqa: E741
 
-    A = te.placeholder((M // l, K // r, l, r), name="A", dtype=in_dtype)
-    B = te.placeholder((N // l, K // r, l, r), name="B", dtype=in_dtype)
-    Bias = te.placeholder((N,), name="Bias", dtype=in_dtype)
+    A = _placeholder((M // l, K // r, l, r), in_dtype, "A")
+    B = _placeholder((N // l, K // r, l, r), in_dtype, "B")
+    Bias = _placeholder((N,), in_dtype, "Bias")
 
-    _, inversed_index_map = get_propagate_map(trans=False, dtype=in_dtype, matrix_name="A")
-
-    def fcompute(i, j):
-        warp_i, warp_j = i % l, j % r
-        spatial_args = i // l, j // r
-        if transform_kind_input >= TransformKind.IntraWarpTransform:
-            warp_i, warp_j = inversed_index_map.map_indices([warp_i, warp_j])
-        new_index = (*spatial_args, warp_i, warp_j)
-        return A[new_index]
+    _, inversed_index_map_a = _propagate_map_cached(False, in_dtype, "A")
+    _, inversed_index_map_b = _propagate_map_cached(True, in_dtype, "B")
 
     A_reindex = te.compute(
         (M, K),
-        fcompute,
+        _reindexer(A, inversed_index_map_a, transform_kind_input, l, r),
         name="A_reindex",
     )
 
-    _, inversed_index_map = get_propagate_map(trans=True, dtype=in_dtype, matrix_name="B")
-
-    def fcompute(i, j):
-        warp_i, warp_j = i % l, j % r
-        spatial_args = i // l, j // r
-        if transform_kind_weight >= TransformKind.IntraWarpTransform:
-            warp_i, warp_j = inversed_index_map.map_indices([warp_i, warp_j])
-        new_index = (*spatial_args, warp_i, warp_j)
-        return B[new_index]
-
     B_reindex = te.compute(
         (N, K),
-        fcompute,
+        _reindexer(B, inversed_index_map_b, transform_kind_weight, l, r),
         name="B_reindex",
     )
     # Describe the matrix multiplication in TE
-    k = te.reduce_axis((0, K), name="k")
+    k = _reduce_axis(K)
     C = te.compute(
         (M, N),
         lambda i, j: te.sum(
@@ -280,22 +366,44 @@ def matmul_nt_propagate_a_propagate_b(
         ),
         name="C",
     )
-    last_output = C
-    if accum_dtype != out_dtype:
-        D = te.compute((M, N), lambda i, j: C[i, j].astype(out_dtype), name="D")
-        last_output = D
-
-    if with_bias:
-        E = te.compute((M, N), lambda i, j: last_output[i, j] + Bias[j], name="E")
-        last_output = E
-
-    args = [A, B, Bias, last_output] if with_bias else [A, B, last_output]
+    return _finalize(
+        C,
+        Bias,
+        [A, B],
+        with_bias,
+        accum_dtype,
+        out_dtype,
+        M,
+        N,
+        attrs=(
+            (_INPUT_TRANSFORM_KIND, transform_kind_input.value),
+            (_WEIGHT_TRANSFORM_KIND, transform_kind_weight.value),
+        ),
+    )
 
-    func = te.create_prim_func(args)
-    func = func.with_attr("input_transform_kind", transform_kind_input.value)
-    func = func.with_attr("weight_transform_kind", transform_kind_weight.value)
 
-    return tvm.IRModule.from_expr(func)
+# Dispatch table of the builders keyed by (layout, propagate_a, propagate_b), every entry
+# is called with the common arguments and the transform kinds of A and B.
+_DISPATCH = {
+    ("nn", False, False):
+        lambda args, propagate_a, propagate_b: matmul_nn(*args),
+    ("nn", False, True):
+        lambda args, propagate_a, propagate_b: matmul_nn_propagate_b(
+            *args, transform_kind=propagate_b),
+    ("nt", False, False):
+        lambda args, propagate_a, propagate_b: matmul_nt(*args),
+    ("tn", False, False):
+        lambda args, propagate_a, propagate_b: matmul_tn(*args),
+    ("nt", True, False):
+        lambda args, propagate_a, propagate_b: matmul_nt_propagate_a(
+            *args, transform_kind=propagate_a),
+    ("nt", False, True):
+        lambda args, propagate_a, propagate_b: matmul_nt_propagate_b(
+            *args, transform_kind=propagate_b),
+    ("nt", True, True):
+        lambda args, propagate_a, propagate_b: matmul_nt_propagate_a_propagate_b(
+            *args, transform_kind_input=propagate_a, transform_kind_weight=propagate_b),
+}
 
 
 def select_implementation(
@@ -310,47 +418,26 @@ def select_implementation(
     propagate_a: TransformKind = TransformKind.NonTransform,
     propagate_b: TransformKind = TransformKind.NonTransform,
 ):
-    if layout == "nn":
-        if propagate_a or propagate_b:
-            raise ValueError(
-                "Currently only support propagate_a=False and propagate_b=False for layout=nn")
-        return matmul(M, N, K, in_dtype, out_dtype, accum_dtype, with_bias, layout)
-    elif layout == "nt":
-        if propagate_a and propagate_b:
-            return matmul_nt_propagate_a_propagate_b(
-                M,
-                N,
-                K,
-                in_dtype,
-                out_dtype,
-                accum_dtype,
-                with_bias,
-                transform_kind_input=propagate_a,
-                transform_kind_weight=propagate_b,
-            )
-        elif propagate_a:
-            return matmul_nt_propagate_a(
-                M,
-                N,
-                K,
-                in_dtype,
-                out_dtype,
-                accum_dtype,
-                with_bias,
-                transform_kind=propagate_a,
-            )
-        elif propagate_b:
-            return matmul_nt_propagate_b(
-                M,
-                N,
-                K,
-                in_dtype,
-                out_dtype,
-                accum_dtype,
-                with_bias,
-                transform_kind=propagate_b,
-            )
-        else:
-            return matmul(M, N, K, in_dtype, out_dtype, accum_dtype, with_bias, layout)
-    else:
+    key = (layout, bool(propagate_a), bool(propagate_b))
+    if key not in _DISPATCH:
+        if layout in {supported_layout for supported_layout, _, _ in _DISPATCH}:
+            raise ValueError(f"Unsupported propagate_a={propagate_a} and "
+                             f"propagate_b={propagate_b} for layout={layout}")
         raise ValueError(f"Unsupported layout: {layout}")
+    # all the dynamic m are built into the same symbolic function, normalize them
+    # to a single hashable key.
+    if not isinstance(M, int):
+        M = "dyn"
+    func = _build_prim_func(M, N, K, in_dtype, out_dtype, accum_dtype, with_bias, layout,
+                            propagate_a, propagate_b)
+    # the operators update the function of their module in place, always hand out
+    # a new module of the cached function.
+    return tvm.IRModule.from_expr(func)
+
+
+@lru_cache(maxsize=1024)
+def _build_prim_func(M, N, K, in_dtype, out_dtype, accum_dtype, with_bias, layout, propagate_a,
+                     propagate_b):
+    key = (layout, bool(propagate_a), bool(propagate_b))
+    args = (M, N, K, in_dtype, out_dtype, accum_dtype, with_bias)
+    return _DISPATCH[key](args, propagate_a, propagate_b)["main"]
@@ -1,11 +1,23 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
+from functools import lru_cache
 from bitblas.gpu.matmul_analysis import get_propagate_map
 from ..operator import TransformKind
 from typing import Literal
 from tvm import te, IRModule
 
 
+@lru_cache(maxsize=None)
+def _cached_maps(
+    datatype: str,
+    propagate_kind: TransformKind,
+    transpose_matrix: bool,
+):
+    # the inverse map is solved from an affine system inside get_propagate_map,
+    # share the immutable IndexMaps among the ops built with the same layout.
+    return get_propagate_map(transpose_matrix, dtype=datatype, matrix_name=propagate_kind)
+
+
 def select_implementation(
     M: int,
     N: int,
@@ -29,8 +41,7 @@ def select_implementation(
     if group_size == -1:
         group_size = N
 
-    intra_index_map, inverse_indexmap = get_propagate_map(
-        transpose_matrix, dtype=datatype, matrix_name=propagate_kind)
+    intra_index_map, inverse_indexmap = _cached_maps(datatype, propagate_kind, transpose_matrix)
 
     inp = te.placeholder((M, N // group_size), name="inp", dtype=datatype)
 
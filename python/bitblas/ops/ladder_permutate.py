@@ -1,7 +1,8 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
+from tvm import IRModule, tir
 from tvm.target import Target
-from typing import Literal, Union
+from typing import Literal, Optional, Union
 from .operator import Operator
 from .impl.ladder_permutate_impl import select_implementation
 from dataclasses import dataclass
@@ -40,9 +41,25 @@ class LadderPermutate(Operator):
             self.optimized_func = self.apply_default_schedule(self.prim_func_mod, target)
             if enable_tuning:
                 self.hardware_aware_finetune()
+        elif target.kind.name == "llvm":
+            self.optimized_func = self.apply_cpu_schedule(self.prim_func_mod)
         if not from_database:
             self._build_runtime_module(target)
 
+    def apply_cpu_schedule(self, func_mod: IRModule) -> Optional[IRModule]:
+        if self.transform_kind == 0:
+            return None
+        sch = tir.Schedule(func_mod)
+        (block,) = sch.get_child_blocks(sch.get_block("root"))
+        i, j, ii, jj = sch.get_loops(block)
+        # every (l, r) tile is a constant shuffle of its source tile, unroll the rows
+        # and vectorize the columns so that llvm can lower it to wide loads and
+        # byte/word permutes (e.g. vpermb/vpermw on avx512 targets).
+        sch.parallel(sch.fuse(i, j))
+        sch.unroll(ii)
+        sch.vectorize(jj)
+        return sch.mod
+
     # select implementation based on the Operator config
     def _select_implementation(self):
         return select_implementation(
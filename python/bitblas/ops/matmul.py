@@ -3,9 +3,8 @@
 import tvm
 import numpy as np
 from tvm.target import Target
-from bitblas.utils.tensor_adapter import tvm_tensor_to_torch
-from typing import List, Union, Optional, Any, Tuple
-from .operator import Operator, TransformKind
+from typing import List, Union, Any, Tuple
+from .operator import Operator, TransformKind, OPExecutorCPU
 from .impl.matmul_impl import select_implementation
 from bitblas.utils import tensor_replace_dp4a, tensor_remove_make_int4, tensor_remove_make_int2
 from dataclasses import dataclass
@@ -15,34 +14,6 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-class TransformExecutorCPU:
-
-    def __init__(self, operators: Optional[List[Operator]] = None):
-        if operators is None:
-            operators = []
-        self.operators = operators
-
-    def append(self, op):
-        self.operators.append(op)
-
-    def is_none(self):
-        return len(self.operators) == 0
-
-    def forward(self, weight):
-        inputs = [weight]
-        for op in self.operators:
-            inputs.append(tvm_tensor_to_torch(op.get_profile_tensors()[-1]).cpu())
-            inputs = [op.forward(*inputs)]
-        return inputs[-1]
-
-    def __call__(self, *args: Any, **kwds: Any) -> Any:
-        return self.forward(*args, **kwds)
-
-    @property
-    def size(self):
-        return len(self.operators)
-
-
 @dataclass(frozen=True)
 class MatmulConfig:
     M: Union[int, Tuple[int]]
@@ -55,6 +26,7 @@ class MatmulConfig:
     # layout of matrix A and B
     # "nn": C[i, j] = A[i, k] * B[k, j]
     # "nt": C[i, j] = A[i, k] * B[j, k]
+    # "tn": C[i, j] = A[k, i] * B[j, k]
     layout: str = "nt"
     # weight transformation kind of matrix A
     propagate_a: TransformKind = TransformKind.NonTransform
@@ -85,9 +57,16 @@ class MatmulConfig:
         elif isinstance(self.propagate_b, int):
             object.__setattr__(self, "propagate_b", TransformKind(self.propagate_b))
 
+        if self.layout == "nn" and self.propagate_b and self.in_dtype != "float16":
+            raise ValueError(
+                f"propagate_b is not supported for layout=nn with in_dtype={self.in_dtype}, "
+                "only float16 weights can be propagated with the nn layout.")
+
 
 class Matmul(Operator):
 
+    CACHEABLE_POSTPROC = True
+
     def __init__(
         self,
         config: MatmulConfig,
@@ -130,9 +109,10 @@ class Matmul(Operator):
             self.ladder_permutate_a = None
 
         if self.propagate_b:
+            # the weight is stored as (N, K) for nt and as (K, N) for nn
             ladder_permutate_config = LadderPermutateConfig(
-                M=self.N,
-                N=self.K,
+                M=self.N if self.layout == "nt" else self.K,
+                N=self.K if self.layout == "nt" else self.N,
                 datatype=self.in_dtype,
                 storage_dtype=self.in_dtype,
                 propagate_kind="B",
@@ -146,13 +126,13 @@ class Matmul(Operator):
         else:
             self.ladder_permutate_b = None
 
-        input_executors = TransformExecutorCPU()
+        input_executors = OPExecutorCPU()
         if self.ladder_permutate_a is not None:
             input_executors.append(self.ladder_permutate_b)
 
         self.input_executors = input_executors
 
-        weight_executors = TransformExecutorCPU()
+        weight_executors = OPExecutorCPU()
         if self.ladder_permutate_b is not None:
             weight_executors.append(self.ladder_permutate_b)
 
@@ -186,7 +166,8 @@ class Matmul(Operator):
             propagate_b=self.propagate_b,
         )
 
-    def post_process(self, code: str) -> str:
+    @staticmethod
+    def post_process(code: str) -> str:
         code = tensor_replace_dp4a(code)
         code = tensor_remove_make_int4(code)
         code = tensor_remove_make_int2(code)
@@ -228,11 +209,11 @@ class Matmul(Operator):
 
     def forward(self, *args) -> Any:
         if self.lib is None:
-            self._forward_from_torch_func(*args)
+            return self._forward_from_torch_func(*args)
         dynamic_symbolic = []
         if self.dynamic_range is not None:
-            # assume we only have one dynamic range
-            m = args[0].shape[0]
+            # assume we only have one dynamic range, A is stored as (K, M) for tn
+            m = args[0].shape[-1] if self.layout == "tn" else args[0].shape[0]
             dynamic_symbolic.append(m)
         self._forward_from_prebuild_lib(*args, *dynamic_symbolic)
 
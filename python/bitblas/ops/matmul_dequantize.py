@@ -3,11 +3,10 @@
 import tvm
 from tvm.target import Target
 from bitblas.base.roller.arch.cuda import CUDA
-from typing import Any, List, Literal, Optional, Tuple, Union
-from .operator import Operator, TransformKind
+from typing import Any, Literal, Tuple, Union
+from .operator import Operator, TransformKind, OPExecutorCPU
 from .impl.matmul_dequantize_impl import select_implementation
 from ..base.utils import tensor_replace_dp4a, tensor_remove_make_int4, tensor_remove_make_int2
-from bitblas.utils.tensor_adapter import tvm_tensor_to_torch
 from dataclasses import dataclass
 from .ladder_permutate import LadderPermutate, LadderPermutateConfig
 from .lop3_permutate import LOP3Permutate, LOP3PermutateConfig
@@ -16,34 +15,6 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-class OPExecutorCPU:
-
-    def __init__(self, operators: Optional[List[Operator]] = None):
-        if operators is None:
-            operators = []
-        self.operators = operators
-
-    def append(self, op):
-        self.operators.append(op)
-
-    def is_none(self):
-        return len(self.operators) == 0
-
-    def forward(self, weight):
-        inputs = [weight]
-        for op in self.operators:
-            inputs.append(tvm_tensor_to_torch(op.get_profile_tensors()[-1]).cpu())
-            inputs = [op.forward(*inputs)]
-        return inputs[-1]
-
-    def __call__(self, *args: Any, **kwds: Any) -> Any:
-        return self.forward(*args, **kwds)
-
-    @property
-    def size(self):
-        return len(self.operators)
-
-
 @dataclass(frozen=True)
 class MatmulWeightOnlyDequantizeConfig:
     M: Union[int, Tuple[int]]
@@ -105,6 +76,8 @@ class MatmulWeightOnlyDequantizeConfig:
 
 class MatmulWeightOnlyDequantize(Operator):
 
+    CACHEABLE_POSTPROC = True
+
     def __init__(
         self,
         config: MatmulWeightOnlyDequantizeConfig,
@@ -231,7 +204,8 @@ class MatmulWeightOnlyDequantize(Operator):
             propagate_b=self.propagate_b,
         )
 
-    def post_process(self, code: str) -> str:
+    @staticmethod
+    def post_process(code: str) -> str:
         code = tensor_replace_dp4a(code)
         code = tensor_remove_make_int4(code)
         code = tensor_remove_make_int2(code)
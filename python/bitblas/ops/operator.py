@@ -1,6 +1,7 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 from abc import ABC, abstractmethod
+from functools import lru_cache
 import tvm
 from tvm import IRModule
 from tvm.target import Target
@@ -10,10 +11,12 @@ from tvm._ffi.base import _LIB, raise_last_ffi_error
 from tvm._ffi._ctypes.types import TVMValue, ArgTypeCode
 import bitblas
 import ctypes
-from typing import List, Dict, Any, Optional
+import hashlib
+import os
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
 import numpy as np
 from ..base import fast_tune, fast_tune_with_dynamic_range
-from copy import deepcopy
 from bitblas.base.roller.arch import get_arch
 from bitblas.utils.tensor_adapter import tvm_tensor_to_torch
 from bitblas.wrapper import CUDASourceWrapper, CUDASourceWrapperWithDynamic
@@ -23,6 +26,48 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# uninitialized buffers reused by profile_latency among the operators (and tuning trials)
+# on the same device, keyed by (device, shape, dtype, index of the buffer in the function).
+# The least recently used buffers are released once the pool exceeds the byte budget.
+_PROFILE_BUFFER_POOL: "OrderedDict[Tuple[str, Tuple[int, ...], str, int], tvm.nd.NDArray]" = (
+    OrderedDict())
+_PROFILE_BUFFER_POOL_MAX_BYTES = 1 << 30
+_PROFILE_BUFFER_POOL_BYTES = 0
+
+
+def clear_profile_buffer_pool():
+    """Releases the device buffers held for profiling."""
+    global _PROFILE_BUFFER_POOL_BYTES
+    _PROFILE_BUFFER_POOL.clear()
+    _PROFILE_BUFFER_POOL_BYTES = 0
+
+
+def _profile_buffer_nbytes(key) -> int:
+    _, shape, dtype, _ = key
+    return int(np.prod(shape)) * tvm.DataType(dtype).bits // 8
+
+
+def _get_pooled_profile_buffer(key, shape, dtype, device) -> tvm.nd.NDArray:
+    global _PROFILE_BUFFER_POOL_BYTES
+    if key in _PROFILE_BUFFER_POOL:
+        _PROFILE_BUFFER_POOL.move_to_end(key)
+        return _PROFILE_BUFFER_POOL[key]
+
+    _PROFILE_BUFFER_POOL_BYTES += _profile_buffer_nbytes(key)
+    # the buffers evicted here are still alive while the caller holds them.
+    while _PROFILE_BUFFER_POOL and _PROFILE_BUFFER_POOL_BYTES > _PROFILE_BUFFER_POOL_MAX_BYTES:
+        evicted_key, _ = _PROFILE_BUFFER_POOL.popitem(last=False)
+        _PROFILE_BUFFER_POOL_BYTES -= _profile_buffer_nbytes(evicted_key)
+    _PROFILE_BUFFER_POOL[key] = tvm.nd.empty(shape, dtype, device=device)
+    return _PROFILE_BUFFER_POOL[key]
+
+
+@lru_cache(maxsize=128)
+def _post_process_cached(post_process, code: str) -> str:
+    # tuning repeatedly builds the same kernels, memoize the string substitutions
+    # of the stateless post processors on the generated code.
+    return post_process(code)
+
 
 class TransformKind(IntEnum):
     NonTransform = 0
@@ -39,6 +84,16 @@ class OperatorConfig:
 
 class Operator(ABC):
 
+    # set by the subclasses whose post_process is a staticmethod that only depends
+    # on the generated code, to reuse the post processed code across builds.
+    CACHEABLE_POSTPROC = False
+
+    # compiled cuda libraries keyed by the compute capability and the hash of the wrapped
+    # source, shared among operators whose tuned kernels generate identical code to skip nvcc.
+    # Only the most recently used libraries are kept, the operators hold on to their own.
+    _lib_cache: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+    _LIB_CACHE_SIZE = 128
+
     def __init__(self, name, config: OperatorConfig, target: Target = None):
         if isinstance(target, str):
             target = Target(target)
@@ -62,6 +117,7 @@ class Operator(ABC):
         self.src_name = None
         self.lib_name = None
         self.lib = None
+        self._lib_call = None
 
     def get_source(self, target: Target = None) -> str:
         if target is None:
@@ -97,6 +153,10 @@ class Operator(ABC):
 
             @tvm.register_func(func_name="tvm_callback_cuda_postproc", override=True)
             def tvm_callback_cuda_postproc(code, _):
+                if type(self).post_process is Operator.post_process:
+                    return code
+                if self.CACHEABLE_POSTPROC:
+                    return _post_process_cached(type(self).post_process, code)
                 return self.post_process(code)
 
             try:
@@ -112,8 +172,10 @@ class Operator(ABC):
                     "Failed to build optimized function for CUDA target with default schedule, Please consider enable hardware aware tuning!"
                 )
         else:
-            # For non-CUDA platforms or when no optimized function is available, build with the primary function
-            rt_mod = tvm.build(self.prim_func, target=target, name=self.name)
+            # For non-CUDA platforms, build with the optimized function if the operator
+            # provides a cpu schedule, otherwise fall back to the primary function
+            func = self.optimized_func if self.optimized_func is not None else self.prim_func
+            rt_mod = tvm.build(func, target=target, name=self.name)
 
         # If the runtime module was successfully built, set up for evaluation
         if rt_mod:
@@ -131,12 +193,25 @@ class Operator(ABC):
                     else:
                         wrapper = CUDASourceWrapper(self.optimized_func, self.get_source(target),
                                                     self.arch)
-                    wrapper.compile_lib()
+                    lib_key = (self.arch.compute_capability,
+                               hashlib.sha256(wrapper.lib_code.encode()).hexdigest())
+                    cached = Operator._lib_cache.get(lib_key)
+                    # the library file is gone if one of its wrappers removed it
+                    if cached is not None and os.path.exists(cached[1]):
+                        Operator._lib_cache.move_to_end(lib_key)
+                        wrapper.src_name, wrapper.lib_name, lib = cached
+                    else:
+                        wrapper.compile_lib()
+                        lib = wrapper.load_lib()
+                        lib.init()
+                        Operator._lib_cache[lib_key] = (wrapper.src_name, wrapper.lib_name, lib)
+                        if len(Operator._lib_cache) > Operator._LIB_CACHE_SIZE:
+                            Operator._lib_cache.popitem(last=False)
                     self.wrapper = wrapper
                     self.src_name = self.wrapper.src_name
                     self.lib_name = self.wrapper.lib_name
-                    self.lib = self.wrapper.load_lib()
-                    self.lib.init()
+                    self.lib = lib
+                    self._init_lib_call()
                 except Exception as e:
                     build_runtime_library_error = e
                     logger.debug(
@@ -145,7 +220,9 @@ class Operator(ABC):
         return rt_mod
 
     def apply_default_schedule(self, func_mod: IRModule, target: Target) -> IRModule:
-        mod_for_opt = deepcopy(func_mod)
+        # clone through a single json round trip on the C++ side, which is much
+        # cheaper than letting deepcopy walk the module through the python side.
+        mod_for_opt = tvm.ir.load_json(tvm.ir.save_json(func_mod))
         with target:
             optimized_mod = (
                 bitblas.ApplyDefaultSchedule(  # pylint: disable=not-callable
@@ -153,6 +230,7 @@ class Operator(ABC):
                     bitblas.gpu.GEMV(),
                     bitblas.gpu.Reduction(),
                     bitblas.gpu.GeneralReduction(),
+                    bitblas.gpu.Permutate(),
                     bitblas.gpu.Fallback(),
                 )(mod_for_opt))
 
@@ -203,7 +281,29 @@ class Operator(ABC):
                 func, target, topk, parallel_build=parallel_build)
         self._build_runtime_module(self.target)
 
-    def get_profile_tensors(self, dynamic_symbolic_constrains: Optional[Dict] = None):
+    def get_profile_tensors(self,
+                            dynamic_symbolic_constrains: Optional[Dict] = None,
+                            fill_random: bool = False,
+                            from_pool: bool = False):
+        """
+        Allocates a tensor on the target device for every buffer parameter of the prim func.
+
+        Timing only requires valid device memory, so by default the tensors are left
+        uninitialized, which avoids the host side random generation and the H2D copy.
+
+        Args:
+            dynamic_symbolic_constrains (Optional[Dict]): The value of the dynamic symbols
+                to use instead of the opt_shapes of the function.
+            fill_random (bool): Whether to fill the tensors with random values, required
+                by callers that check the correctness of the results.
+            from_pool (bool): Whether to take the uninitialized tensors from the device
+                buffer pool shared with the other operators, so repeated profiling of the
+                same shapes does not allocate again. The pooled tensors must only be used
+                for timing, as their content is overwritten by any other profiling.
+
+        Returns:
+            The list of allocated tvm.nd.NDArray.
+        """
         if dynamic_symbolic_constrains is None:
             dynamic_symbolic_constrains = {}
         func = self.prim_func
@@ -231,26 +331,49 @@ class Operator(ABC):
             else:
                 return intype
 
+        rng = np.random.default_rng()
+
+        def random_array(shape, numpy_dtype):
+            # generate directly in a narrow dtype, avoid the transient float64 buffer
+            if np.dtype(numpy_dtype).kind in "iu":
+                return rng.integers(0, 127, size=shape, dtype=numpy_dtype)
+            return rng.random(shape, dtype=np.float32).astype(numpy_dtype)
+
         profile_tensors = []
+        num_same_buffers: Dict[Tuple, int] = {}
         for param in func.params:
             if param not in func.buffer_map:
                 # in case of dynamic symbolic may in params
                 continue
             arg = func.buffer_map[param]
+            shape = [var_warpper(i) for i in arg.shape]
+            if from_pool and not fill_random:
+                # the buffers of a single call must not alias each other, count the
+                # occurrences of the same (shape, dtype) to tell them apart.
+                key = (str(device), tuple(shape), arg.dtype)
+                index = num_same_buffers.get(key, 0)
+                num_same_buffers[key] = index + 1
+                key = key + (index,)
+                profile_tensors.append(_get_pooled_profile_buffer(key, shape, arg.dtype, device))
+                continue
+            if not fill_random:
+                profile_tensors.append(tvm.nd.empty(shape, arg.dtype, device=device))
+                continue
             numpy_dtype = map_numpy_type(arg.dtype)
             profile_tensors.append(
                 tvm.nd.array(
-                    np.random.uniform(0, 1,
-                                      [var_warpper(i) for i in arg.shape]).astype(numpy_dtype),
+                    random_array(shape, numpy_dtype),
                     device=device,
                 ))
-        self.profile_tensors = profile_tensors
+        if not from_pool:
+            # do not keep the pooled buffers alive beyond the eviction of the pool
+            self.profile_tensors = profile_tensors
         return profile_tensors
 
     def profile_latency(self, dynamic_symbolic_constrains: Optional[Dict] = None) -> str:
         if dynamic_symbolic_constrains is None:
             dynamic_symbolic_constrains = {}
-        profile_tensors = self.get_profile_tensors(dynamic_symbolic_constrains)
+        profile_tensors = self.get_profile_tensors(dynamic_symbolic_constrains, from_pool=True)
         latency = self.time_evaluator(*profile_tensors).mean * 1e3
         return latency
 
@@ -283,15 +406,43 @@ class Operator(ABC):
     def forward(self, *args):
         return self._forward_from_torch_func(*args)
 
+    def _init_lib_call(self):
+        # declare the signature of the generated host function once, so that
+        # plain python ints can be passed without boxing them into ctypes objects
+        # on every call. The order follows the wrapper: buffers, dynamic symbols, stream.
+        func = self.prim_func
+        num_buffers = 0
+        dynamic_symbolic_set = set()
+        for param in func.params:
+            if param not in func.buffer_map:
+                continue
+            num_buffers += 1
+            for dim in func.buffer_map[param].shape:
+                if isinstance(dim, tvm.tir.Var):
+                    dynamic_symbolic_set.add(dim.name)
+        self.lib.call.argtypes = ([ctypes.c_void_p] * num_buffers +
+                                  [ctypes.c_int] * len(dynamic_symbolic_set) + [ctypes.c_void_p])
+        self.lib.call.restype = None
+        self._lib_call = self.lib.call
+        if type(self).forward is Operator.forward and self.dynamic_range is None:
+            # torch_func has a non-negligible dlpack overhead on every call,
+            # dispatch the default forward to the prebuilt library instead.
+            self.forward = self._forward_with_prebuild_lib
+
     def _forward_from_prebuild_lib(self, *args, stream=0):
-        ctypes_args = [
-            ctypes.c_void_p(arr.data_ptr()) if not isinstance(arr, int) else arr for arr in args
-        ]
-        ctypes_args.append(ctypes.c_void_p(stream))
-        self.lib.call(*ctypes_args)
+        self._lib_call(*(arr if isinstance(arr, int) else arr.data_ptr() for arr in args), stream)
+
+    def _forward_with_prebuild_lib(self, *args):
+        # the prebuilt library only takes raw device pointers, leave the tensors it can
+        # not handle to torch_func, which checks the device and strides through dlpack.
+        for arr in args:
+            if not isinstance(arr, int) and not (arr.is_cuda and arr.is_contiguous()):
+                return self._forward_from_torch_func(*args)
+        self._forward_from_prebuild_lib(*args)
+        return args[-1]
 
     def call_lib(self, *args, stream=0):
-        self.lib.call(*args, ctypes.c_void_p(stream))
+        self._lib_call(*args, stream)
 
     def _forward_from_tvm_lib_func(self, values):
         tcodes = (ctypes.c_int * self.num_args)()
@@ -326,6 +477,7 @@ class Operator(ABC):
             self.lib_name = lib_name
             self.lib = ctypes.CDLL(lib_name)
             self.lib.init()
+            self._init_lib_call()
 
     @abstractmethod
     def _select_implementation(self) -> IRModule:
@@ -345,17 +497,29 @@ class OPExecutorCPU:
         if operators is None:
             operators = []
         self.operators = operators
+        # the output shapes do not depend on the input, so we resolve them once per
+        # operator instead of generating new profile tensors on every forward.
+        self._output_specs = [self._get_output_spec(op) for op in operators]
+
+    @staticmethod
+    def _get_output_spec(op):
+        output = tvm_tensor_to_torch(op.get_profile_tensors()[-1])
+        return output.shape, output.dtype
 
     def append(self, op):
         self.operators.append(op)
+        self._output_specs.append(self._get_output_spec(op))
 
     def is_none(self):
         return len(self.operators) == 0
 
     def forward(self, weight):
+        import torch
         inputs = [weight]
-        for op in self.operators:
-            inputs.append(tvm_tensor_to_torch(op.get_profile_tensors()[-1]).cpu())
+        for op, (shape, dtype) in zip(self.operators, self._output_specs):
+            # every forward returns a new tensor, the results of the previous calls
+            # are still held by the callers.
+            inputs.append(torch.empty(shape, dtype=dtype))
             inputs = [op.forward(*inputs)]
         return inputs[-1]
 
@@ -281,6 +281,127 @@ def test_matmul_transform_weight(
     torch.testing.assert_close(output_tensor, ref_result, rtol=1e-2, atol=1e-0)
 
 
+@pytest.mark.parametrize(
+    "M,N,K,A_dtype,W_dtype,accum_dtype,out_dtype,fast_decoding",
+    [
+        (1, 768, 768, "float16", "int8", "float16", "float16", False),
+        (1, 768, 768, "float16", "int8", "float16", "float16", True),
+        (1, 768, 768, "float16", "uint8", "float16", "float16", False),
+        (1, 768, 768, "float16", "uint8", "float16", "float16", True),
+    ],
+)
+def test_matmul_transform_weight_8bit(
+    M,
+    N,
+    K,
+    A_dtype,
+    W_dtype,
+    accum_dtype,
+    out_dtype,
+    fast_decoding,
+):
+    import torch
+    torch.random.manual_seed(0)
+
+    matmul_config = MatmulConfig(
+        M=M,
+        N=N,
+        K=K,
+        A_dtype=A_dtype,
+        W_dtype=W_dtype,
+        accum_dtype=accum_dtype,
+        out_dtype=out_dtype,
+        fast_decoding=fast_decoding,
+    )
+    matmul = Matmul(config=matmul_config, enable_tuning=False)
+    if fast_decoding:
+        decode_func = "decode_i8s_to_f16" if W_dtype == "int8" else "decode_i8u_to_f16"
+        assert decode_func in get_codegen_result(matmul)
+
+    input_shape = (M, K)
+    weight_shape = (N, K)
+
+    low, high = (-128, 128) if W_dtype == "int8" else (0, 256)
+    # keep the float16 accumulation away from overflow
+    input_tensor = ((torch.rand(input_shape, dtype=torch.float16) - 0.5) / 16).cuda()
+    intweight_tensor = torch.randint(low, high, weight_shape, dtype=torch.int32).cuda()
+    ref_result = torch.matmul(input_tensor, intweight_tensor.t().to(torch.float16))
+
+    output_tensor = matmul(input_tensor, matmul.transform_weight(intweight_tensor))
+    torch.testing.assert_close(output_tensor, ref_result, rtol=1e-2, atol=1e-0)
+
+
+@pytest.mark.parametrize(
+    "M,N,K,A_dtype,W_dtype,accum_dtype,out_dtype,layout,propagate_b_supported",
+    [
+        (256, 512, 1024, "float16", "float16", "float16", "float16", "nn", True),
+        (256, 512, 1024, "int8", "int8", "int32", "int32", "nn", False),
+        (256, 512, 1024, "float16", "uint4", "float16", "float16", "nn", False),
+    ],
+)
+def test_matmul_config_nn_propagate(M, N, K, A_dtype, W_dtype, accum_dtype, out_dtype, layout,
+                                    propagate_b_supported):
+    from bitblas.ops.operator import TransformKind
+    config_kwargs = dict(
+        M=M,
+        N=N,
+        K=K,
+        A_dtype=A_dtype,
+        W_dtype=W_dtype,
+        accum_dtype=accum_dtype,
+        out_dtype=out_dtype,
+        layout=layout,
+    )
+    config = MatmulConfig(**config_kwargs)
+    # the input is never propagated by default, the weight only when it is implemented
+    assert config.propagate_a == TransformKind.NonTransform
+    assert bool(config.propagate_b) == propagate_b_supported
+    with pytest.raises(ValueError):
+        MatmulConfig(**config_kwargs, propagate_a=True)
+    if not propagate_b_supported:
+        with pytest.raises(ValueError):
+            MatmulConfig(**config_kwargs, propagate_b=True)
+
+
+@pytest.mark.parametrize(
+    "M,N,K,A_dtype,W_dtype,accum_dtype,out_dtype,layout,propagate_b",
+    [
+        (256, 512, 1024, "float16", "float16", "float16", "float16", "nt", 1),
+        (256, 512, 1024, "float16", "float16", "float16", "float16", "nt", 2),
+        (256, 512, 1024, "float16", "float16", "float16", "float16", "nn", 1),
+        (256, 512, 1024, "float16", "float16", "float16", "float16", "nn", 2),
+    ],
+)
+def test_matmul_torch_forward_propagate_b(M, N, K, A_dtype, W_dtype, accum_dtype, out_dtype, layout,
+                                          propagate_b):
+    import torch
+    torch.random.manual_seed(0)
+
+    matmul_config = MatmulConfig(
+        M=M,
+        N=N,
+        K=K,
+        A_dtype=A_dtype,
+        W_dtype=W_dtype,
+        accum_dtype=accum_dtype,
+        out_dtype=out_dtype,
+        layout=layout,
+        propagate_a=False,
+        propagate_b=propagate_b,
+    )
+    matmul = Matmul(config=matmul_config, enable_tuning=False)
+
+    # N != K, so a swapped (N, K) tiling of the weight can not pass
+    weight_shape = (N, K) if layout == "nt" else (K, N)
+    input_tensor = (torch.rand((M, K), dtype=torch.float16) - 0.5).cuda()
+    weight_tensor = (torch.rand(weight_shape, dtype=torch.float16) - 0.5).cuda()
+    ref_result = torch.matmul(input_tensor,
+                              weight_tensor.t() if layout == "nt" else weight_tensor)
+
+    output_tensor = matmul(input_tensor, matmul.transform_weight(weight_tensor))
+    torch.testing.assert_close(output_tensor, ref_result, rtol=1e-2, atol=1e-1)
+
+
 # fmt: on
 if __name__ == "__main__":
     bitblas.testing.main()
@@ -3,11 +3,42 @@
 import pytest
 import bitblas
 from bitblas.ops.ladder_permutate import LadderPermutate, LadderPermutateConfig
+import numpy as np
 import tvm
 
 target = tvm.target.Target("llvm")
 
 
+def random_input(shape, dtype):
+    if np.dtype(dtype).kind in "iu":
+        return np.random.randint(0, 127, size=shape).astype(dtype)
+    return np.random.rand(*shape).astype(dtype)
+
+
+def run_permutate(ladder_permutate, inp):
+    *_, out = ladder_permutate.get_profile_tensors()
+    ladder_permutate.rt_mod(tvm.nd.array(inp, device=ladder_permutate.arch.device), out)
+    return out.numpy()
+
+
+def ref_permutate(inp, datatype, propagate_kind, transpose_matrix, transform_kind):
+    from bitblas.gpu.matmul_analysis import get_propagate_map
+    l, r = (16, 32) if datatype == "int8" else (16, 16)  # noqa: E741
+    M, N = inp.shape
+    tiled = inp.reshape(M // l, l, N // r, r).transpose(0, 2, 1, 3)
+    if transform_kind < 2:
+        return tiled
+    intra_index_map, _ = get_propagate_map(
+        transpose_matrix, dtype=datatype, matrix_name=propagate_kind)
+    analyzer = tvm.arith.Analyzer()
+    rows, cols = np.zeros((l, r), dtype=np.int64), np.zeros((l, r), dtype=np.int64)
+    for ii in range(l):
+        for jj in range(r):
+            src = intra_index_map.map_indices([tvm.tir.const(ii), tvm.tir.const(jj)])
+            rows[ii, jj], cols[ii, jj] = (int(analyzer.simplify(e)) for e in src)
+    return tiled[:, :, rows, cols]
+
+
 # fmt: off
 @pytest.mark.parametrize(
     "M,N,datatype,dequantize_bits,storage_dtype,propagate_kind,transpose_matrix,transform_kind,target_instruction",
@@ -91,7 +122,198 @@ def test_ladder_permutate_profile_latency_cuda(
     assert latency
 
 
+@pytest.mark.parametrize(
+    "M,N,datatype,dequantize_bits,storage_dtype,propagate_kind,transpose_matrix,transform_kind",
+    [
+        (1024, 1024, "float16", -1, "float16", "B", True, 1),
+        (1024, 1024, "float16", -1, "float16", "B", True, 2),
+        (1024, 1024, "float16", -1, "float16", "B", False, 2),
+        (1024, 1024, "float16", -1, "float16", "A", False, 2),
+        (1024, 1024, "int8", -1, "int8", "B", True, 2),
+        (1024, 1024, "int8", -1, "int8", "B", False, 1),
+        # dequantize propagation
+        (1024, 1024, "float16", 4, "uint32", "B", True, 2),
+        (1024, 1024, "float16", 4, "int8", "B", True, 2),
+    ])
+def test_ladder_permutate_cuda_correctness(
+    M,
+    N,
+    datatype,
+    dequantize_bits,
+    storage_dtype,
+    propagate_kind,
+    transpose_matrix,
+    transform_kind,
+):
+    ladder_permutate_config = LadderPermutateConfig(
+        M=M,
+        N=N,
+        datatype=datatype,
+        dequantize_bits=dequantize_bits,
+        storage_dtype=storage_dtype,
+        propagate_kind=propagate_kind,
+        transpose_matrix=transpose_matrix,
+        transform_kind=transform_kind,
+    )
+    ladder_permutate = LadderPermutate(
+        config=ladder_permutate_config,
+        target="cuda",
+    )
+    # the permutate rule must be picked over the fallback
+    assert "shared" in ladder_permutate.get_source()
+    ref_permutate = LadderPermutate(
+        config=ladder_permutate_config,
+        target=target,
+    )
+    inp_shape = [int(i) for i in ref_permutate.prim_func.buffer_map[
+        ref_permutate.prim_func.params[0]].shape]
+    inp = random_input(inp_shape, storage_dtype)
+    np.testing.assert_equal(
+        run_permutate(ladder_permutate, inp), run_permutate(ref_permutate, inp))
+
+
+@pytest.mark.parametrize(
+    "M,N,datatype,propagate_kind,transpose_matrix,transform_kind",
+    [
+        (1024, 1024, "float16", "B", True, 1),
+        (1024, 1024, "float16", "B", False, 1),
+        (1024, 1024, "float16", "B", True, 2),
+        (1024, 1024, "float16", "B", False, 2),
+        (1024, 1024, "float16", "A", False, 2),
+        (1024, 1024, "int8", "B", True, 2),
+        (1024, 1024, "int8", "B", False, 2),
+    ])
+def test_ladder_permutate_cpu_correctness(
+    M,
+    N,
+    datatype,
+    propagate_kind,
+    transpose_matrix,
+    transform_kind,
+):
+    ladder_permutate_config = LadderPermutateConfig(
+        M=M,
+        N=N,
+        datatype=datatype,
+        storage_dtype=datatype,
+        propagate_kind=propagate_kind,
+        transpose_matrix=transpose_matrix,
+        transform_kind=transform_kind,
+    )
+    ladder_permutate = LadderPermutate(
+        config=ladder_permutate_config,
+        target=target,
+    )
+    inp = random_input((M, N), datatype)
+    np.testing.assert_equal(
+        run_permutate(ladder_permutate, inp),
+        ref_permutate(inp, datatype, propagate_kind, transpose_matrix, transform_kind))
+
+
+@pytest.mark.parametrize(
+    "M,N,datatype,dequantize_bits,storage_dtype,transform_kind",
+    [
+        (16384, 16384, "float16", -1, "float16", 2),
+        (16384, 16384, "int8", -1, "int8", 2),
+        (16384, 16384, "float16", 4, "uint32", 2),
+    ])
+def test_ladder_permutate_cuda_latency_against_fallback(
+    M,
+    N,
+    datatype,
+    dequantize_bits,
+    storage_dtype,
+    transform_kind,
+):
+    ladder_permutate_config = LadderPermutateConfig(
+        M=M,
+        N=N,
+        datatype=datatype,
+        dequantize_bits=dequantize_bits,
+        storage_dtype=storage_dtype,
+        propagate_kind="B",
+        transpose_matrix=True,
+        transform_kind=transform_kind,
+    )
+    ladder_permutate = LadderPermutate(
+        config=ladder_permutate_config,
+        target="cuda",
+    )
+    permutate_latency = ladder_permutate.profile_latency()
+
+    cuda_target = ladder_permutate.target
+    with cuda_target:
+        ladder_permutate.optimized_func = bitblas.ApplyDefaultSchedule(bitblas.gpu.Fallback())(
+            ladder_permutate.prim_func_mod)
+    ladder_permutate._build_runtime_module(cuda_target)
+    fallback_latency = ladder_permutate.profile_latency()
+    print(f"permutate: {permutate_latency:.4f} ms, fallback: {fallback_latency:.4f} ms")
+    assert permutate_latency <= fallback_latency * 1.1
+
+
 # fmt: on
 
+
+def test_ladder_permutate_forward_checks_tensors():
+    import torch
+    ladder_permutate_config = LadderPermutateConfig(
+        M=1024,
+        N=1024,
+        datatype="float16",
+        storage_dtype="float16",
+        propagate_kind="B",
+        transpose_matrix=True,
+        transform_kind=2,
+    )
+    ladder_permutate = LadderPermutate(
+        config=ladder_permutate_config,
+        target="cuda",
+    )
+    ref_permutate = LadderPermutate(
+        config=ladder_permutate_config,
+        target=target,
+    )
+    weight = torch.rand((1024, 1024), dtype=torch.float16)
+    ref_result = ref_permutate(weight, torch.empty_like(weight))
+    result = ladder_permutate(weight.cuda(), torch.empty_like(weight).cuda())
+    torch.testing.assert_close(result.cpu(), ref_result, rtol=0, atol=0)
+
+    # the tensors the prebuilt library can not take must be rejected instead of
+    # handing their pointers to the kernel.
+    with pytest.raises(Exception):
+        ladder_permutate(weight, torch.empty_like(weight))
+    with pytest.raises(Exception):
+        ladder_permutate(weight.cuda().t(), torch.empty_like(weight).cuda())
+
+
+def test_ladder_permutate_profile_tensors_not_pooled():
+    from bitblas.ops.operator import clear_profile_buffer_pool
+    ladder_permutate_config = LadderPermutateConfig(
+        M=1024,
+        N=1024,
+        datatype="float16",
+        storage_dtype="float16",
+        propagate_kind="B",
+        transpose_matrix=True,
+        transform_kind=2,
+    )
+    ladder_permutate = LadderPermutate(
+        config=ladder_permutate_config,
+        target=target,
+    )
+    assert ladder_permutate.profile_latency()
+    # repeated profiling reuses the same pooled buffers
+    pooled = ladder_permutate.get_profile_tensors(from_pool=True)
+    assert all(a is b for a, b in zip(pooled, ladder_permutate.get_profile_tensors(from_pool=True)))
+    # the tensors handed out for execution are private to the caller
+    profile_tensors = ladder_permutate.get_profile_tensors()
+    assert all(tensor is not buffer for tensor in profile_tensors for buffer in pooled)
+    assert all(a is not b for a, b in zip(profile_tensors, ladder_permutate.get_profile_tensors()))
+    # an emptied pool allocates again
+    clear_profile_buffer_pool()
+    assert all(
+        a is not b for a, b in zip(pooled, ladder_permutate.get_profile_tensors(from_pool=True)))
+
+
 if __name__ == "__main__":
     bitblas.testing.main()
@@ -145,6 +145,13 @@ def test_matmul_profile_latency(
         (256, 256, 256, "float16", "float16", "float16", False, False, 0, "nt"),
         (256, 256, 256, "float16", "float16", "float16", False, False, 1, "nt"),
         (256, 256, 256, "float16", "float16", "float16", False, False, 2, "nt"),
+        (256, 256, 256, "float16", "float16", "float16", False, False, False, "nn"),
+        (256, 256, 256, "float16", "float16", "float16", False, False, 1, "nn"),
+        (256, 256, 256, "float16", "float16", "float16", False, False, 2, "nn"),
+        (256, 512, 1024, "float16", "float16", "float16", False, False, 2, "nt"),
+        (256, 512, 1024, "float16", "float16", "float16", False, False, 1, "nn"),
+        (256, 512, 1024, "float16", "float16", "float16", False, False, 2, "nn"),
+        (256, 256, 256, "float16", "float16", "float16", False, False, False, "tn"),
     ],
 )
 def test_matmul_torch_forward(
@@ -178,14 +185,15 @@ def test_matmul_torch_forward(
         target=target,
     )
     # convert tensors to torch
-    input_shape = (M, K)
-    weight_shape = (N, K) if layout == "nt" else (K, N)
+    input_shape = (K, M) if layout == "tn" else (M, K)
+    weight_shape = (K, N) if layout == "nn" else (N, K)
     output_shape = (M, N)
     inputs = []
     inputs.append(torch.rand(input_shape, dtype=torch.float16).cuda())
     inputs.append(torch.rand(weight_shape, dtype=torch.float16).cuda())
     inputs.append(torch.rand(output_shape, dtype=torch.float16).cuda())
-    ref_result = torch.matmul(inputs[0], inputs[1].t() if layout == "nt" else inputs[1])
+    ref_result = torch.matmul(inputs[0].t() if layout == "tn" else inputs[0],
+                              inputs[1] if layout == "nn" else inputs[1].t())
 
     permuted_inputs = []
     if matmul.input_transform is not None:
@@ -268,6 +276,51 @@ def test_matmul_torch_forward_int(
         permuted_inputs[-1].to(torch.float32), ref_result, rtol=1e-2, atol=1e-2)
 
 
+@pytest.mark.parametrize(
+    "M,N,K,in_dtype,out_dtype,accum_dtype,with_bias,propagate_a,propagate_b,layout",
+    [
+        (256, 256, 256, "float16", "float16", "float16", False, False, 2, "nt"),
+    ],
+)
+def test_matmul_weight_transform_not_aliased(
+    M,
+    N,
+    K,
+    in_dtype,
+    out_dtype,
+    accum_dtype,
+    with_bias,
+    propagate_a,
+    propagate_b,
+    layout,
+):
+    import torch
+
+    matmul_config = MatmulConfig(
+        M=M,
+        N=N,
+        K=K,
+        in_dtype=in_dtype,
+        out_dtype=out_dtype,
+        accum_dtype=accum_dtype,
+        with_bias=with_bias,
+        propagate_a=propagate_a,
+        propagate_b=propagate_b,
+        layout=layout,
+    )
+    matmul = Matmul(
+        config=matmul_config,
+        target=target,
+    )
+    weight_shape = (N, K) if layout == "nt" else (K, N)
+    transformed = matmul.weight_transform(torch.rand(weight_shape, dtype=torch.float16))
+    expected = transformed.clone()
+    other = matmul.weight_transform(torch.rand(weight_shape, dtype=torch.float16))
+    # transforming another weight must not overwrite the previous result
+    assert transformed.data_ptr() != other.data_ptr()
+    torch.testing.assert_close(transformed, expected, rtol=0, atol=0)
+
+
 # fmt: on
 
 if __name__ == "__main__":